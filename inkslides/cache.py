@@ -0,0 +1,247 @@
+import errno
+import json
+import os
+import re
+import shutil
+import time
+
+# the default size limit of all cache folders together: 1 GiB
+DEFAULT_LIMIT = 1 << 30
+
+# temporary files of other folders are only removed after this many
+# seconds, as they may belong to a build that is still running
+TMP_MAX_AGE = 24 * 60 * 60
+
+
+class Cache(object):
+    """
+    Manages the cache folders ./.inkslides-<base> that are kept between
+    builds. Every frame of a deck is cached as a group of files with the
+    same stem, i.e. slide-N.svg and the slide-N.pdf or slide-N.png made
+    from it. Groups are evicted least recently used first, once all
+    cache folders together grow larger than limit bytes.
+
+    Each folder also contains a small stats file counting the cache
+    hits and misses of the builds, and the number of frames of the last
+    full build, which is used to detect stale frames.
+    """
+
+    PREFIX = '.inkslides-'
+    STATS = 'stats.json'
+
+    def __init__(self, root='.', limit=DEFAULT_LIMIT):
+        self.root = root
+        self.limit = limit
+
+    def folders(self):
+        """Returns the paths of all cache folders."""
+        return sorted(
+            os.path.join(self.root, f) for f in os.listdir(self.root)
+            if f.startswith(self.PREFIX) and os.path.isdir(os.path.join(self.root, f))
+        )
+
+    def read_stats(self, folder):
+        try:
+            with open(os.path.join(folder, self.STATS)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+    def record(self, folder, hits, misses, frames=None):
+        """
+        Adds the hits and misses of a build to the stats of folder. frames
+        is the number of frames of the deck and only given for full builds.
+        """
+        stats = self.read_stats(folder)
+        stats['hits'] += hits
+        stats['misses'] += misses
+        if frames is not None:
+            stats['frames'] = frames
+
+        path = os.path.join(folder, self.STATS)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(stats, f)
+        os.rename(path + '.tmp', path)
+
+    def groups(self, folder):
+        """
+        Returns a list of (stem, paths, size, last_used) tuples of the frames
+        cached in folder. last_used is the newest access or modification
+        time of the files, the access time is set on every cache hit.
+        Files that another build removes or renames meanwhile are skipped.
+        """
+        groups = {}
+        for f in listdir(folder):
+            if f == self.STATS:
+                continue
+            path = os.path.join(folder, f)
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                continue
+            stem = f.split('.')[0]
+            groups.setdefault(stem, []).append((path, st))
+
+        ret = []
+        for stem, files in groups.items():
+            ret.append((stem, [p for p, st in files], sum(st.st_size for p, st in files),
+                        max(max(st.st_atime, st.st_mtime) for p, st in files)))
+
+        return ret
+
+    def stale(self, folder, current=False):
+        """
+        Returns the files in folder that will never be used again: left over
+        temporary files of interrupted builds, and frames beyond the end of
+        the deck as of its last full build. Unless folder is the one of the
+        current build, temporary files are only stale after TMP_MAX_AGE
+        seconds, since they may belong to a build that is still running.
+        """
+        frames = self.read_stats(folder).get('frames')
+        tmp_limit = time.time() - TMP_MAX_AGE
+
+        ret = []
+        for stem, paths, size, last_used in self.groups(folder):
+            match = re.match(r'slide-(\d+)$', stem)
+            if frames is not None and match and int(match.group(1)) >= frames:
+                ret.extend(p for p in paths if not p.endswith('.tmp'))
+            for p in paths:
+                if p.endswith('.tmp') and (current or getmtime(p, time.time()) < tmp_limit):
+                    ret.append(p)
+
+        return ret
+
+    def prune(self, folder, keep):
+        """
+        Removes all files from folder that are not in keep. Used after a
+        full build, where keep holds the files of all frames of the deck.
+        """
+        keep = set(os.path.normpath(p) for p in keep)
+        for stem, paths, size, last_used in self.groups(folder):
+            for p in paths:
+                if os.path.normpath(p) not in keep:
+                    remove(p)
+
+    def size(self):
+        return sum(size for folder in self.folders() for stem, paths, size, last_used in self.groups(folder))
+
+    def reclaimable(self, folder=None):
+        """
+        The number of bytes gc() would free, either in total or of the
+        stale files in a single folder.
+        """
+        if folder is not None:
+            return sum(getsize(p) for p in self.stale(folder))
+
+        stale = sum(self.reclaimable(f) for f in self.folders())
+        if self.limit is None:
+            return stale
+
+        return stale + max(0, self.size() - stale - self.limit)
+
+    def gc(self, protect=(), current=None):
+        """
+        Removes the stale files and then evicts the least recently used
+        frames until the cache fits into the size limit. Files in protect,
+        usually the ones of the build that just finished, are never evicted.
+        current is the folder of that build, see stale(). Returns the number
+        of freed bytes.
+        """
+        current = os.path.normpath(current) if current else None
+
+        freed = 0
+        for folder in self.folders():
+            for p in self.stale(folder, os.path.normpath(folder) == current):
+                freed += remove(p)
+
+        if self.limit is None:
+            return freed
+
+        protect = set(os.path.normpath(p) for p in protect)
+        groups = [g for folder in self.folders() for g in self.groups(folder)]
+        total = sum(size for stem, paths, size, last_used in groups)
+
+        for stem, paths, size, last_used in sorted(groups, key=lambda g: g[3]):
+            if total <= self.limit:
+                break
+            if any(os.path.normpath(p) in protect for p in paths):
+                continue
+            for p in paths:
+                remove(p)
+            total -= size
+            freed += size
+
+        return freed
+
+    def clear(self):
+        """Removes all cache folders. Returns the number of freed bytes."""
+        freed = self.size()
+        for folder in self.folders():
+            shutil.rmtree(folder)
+        return freed
+
+
+def listdir(folder):
+    # the folder may be removed by `inkslides cache clear` meanwhile
+    try:
+        return os.listdir(folder)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return []
+
+
+def getsize(path, default=0):
+    try:
+        return os.path.getsize(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return default
+
+
+def getmtime(path, default):
+    try:
+        return os.path.getmtime(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return default
+
+
+def remove(path):
+    """Removes path, if it still exists. Returns the number of freed bytes."""
+    size = getsize(path)
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return 0
+    return size
+
+
+def format_size(num):
+    if num < 1024:
+        return '{} B'.format(num)
+
+    for unit in ('KiB', 'MiB', 'GiB'):
+        num /= 1024.
+        if num < 1024:
+            break
+
+    return '{:.1f} {}'.format(num, unit)
+
+
+def parse_size(spec):
+    """
+    Parse a size like "500M" or "2G" into a number of bytes. Raises a
+    ValueError for malformed sizes.
+    """
+    match = re.match(r'^\s*(\d+)\s*([kKmMgG]?)i?[bB]?\s*$', spec)
+    if not match:
+        raise ValueError("invalid size: %s" % spec)
+
+    return int(match.group(1)) * 1024 ** ' kmg'.index(match.group(2).lower() or ' ')
@@ -1,12 +1,25 @@
 import multiprocessing
+import os
 import subprocess
 
 
 class InkscapeWorker(multiprocessing.Process):
-    def __init__(self, queue):
+    def __init__(self, queue, dpi=None, result_queue=None):
         super(InkscapeWorker, self).__init__()
         self.queue = queue
 
+        # if given, the name of every finished file is put here
+        self.result_queue = result_queue
+
+        # if a dpi is given, we export PNG bitmaps instead of PDF files
+        self.dpi = dpi
+
+    def export_command(self, svg_file, out_file_name):
+        if self.dpi:
+            return '-e "{1}" -d {2:d} "{0}"\n'.format(svg_file, out_file_name, self.dpi)
+
+        return '-A "{1}" "{0}"\n'.format(svg_file, out_file_name)
+
     def wait_for_inkscape(self):
         while self.ink.stdout.read(1) != b'>':
             pass
@@ -21,20 +34,31 @@ class InkscapeWorker(multiprocessing.Process):
         # first, wait for inkscape startup
         self.wait_for_inkscape()
 
-        for svg_file, pdf_file_name, cached in iter(self.queue.get, None):
+        for svg_file, out_file_name, cached in iter(self.queue.get, None):
 
             # main working loop of the inkscape process
             # we need to wait for ">" to see whether inkscape is ready.
             # The variable ready keeps track of that.
 
             if not cached:
-                command = '-A "{1}" "{0}"\n'.format(svg_file, pdf_file_name)
+                # export to a temporary file first and move it into place
+                # when inkscape is done, so that an interrupted build never
+                # leaves a truncated file behind, which looks cached.
+                tmp_file_name = out_file_name + '.tmp'
+                command = self.export_command(svg_file, tmp_file_name)
                 self.ink.stdin.write(command.encode("UTF-8"))
                 self.ink.stdin.flush()
 
                 self.wait_for_inkscape()
 
-                print("  Converted {0}".format(pdf_file_name))
+                if os.path.exists(tmp_file_name):
+                    os.rename(tmp_file_name, out_file_name)
+                    print("  Converted {0}".format(out_file_name))
+                else:
+                    print("  Failed to convert {0}".format(out_file_name))
             else:
-                print("  Skipping {0}".format(pdf_file_name))
+                print("  Skipping {0}".format(out_file_name))
+
+            if self.result_queue is not None:
+                self.result_queue.put(out_file_name)
 
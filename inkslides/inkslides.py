@@ -9,10 +9,11 @@ document.
 """
 
 import argparse
-import copy
+import collections
 import hashlib
 import multiprocessing
 import os
+import re
 import shutil
 import subprocess
 import sys
@@ -20,9 +21,16 @@ import tempfile
 import time
 from multiprocessing import Queue
 
-from lxml.etree import XMLParser, parse
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
 
+from lxml.etree import XMLParser, cleanup_namespaces, parse
+
+from .cache import DEFAULT_LIMIT, Cache, format_size, parse_size
 from .inkscape import InkscapeWorker
+from .layers import LayerIndex, diff, iter_bits
 from .merge import MergerWrapper
 from .utils import *
 
@@ -48,7 +56,8 @@ class InkSlides(object):
     Depending on the number of slides, this may take a while.
     """
 
-    def __init__(self, num_workers, flat=False):
+    def __init__(self, num_workers, flat=False, frames=None, sections=None, draft_dpi=None,
+                 cache_limit=DEFAULT_LIMIT, max_in_flight=None):
 
         # Input and output filenames
         self.f_input = None
@@ -59,8 +68,18 @@ class InkSlides(object):
         self.svg_files = None
         self.pdf_files = None
 
-        # a list containing the description of all the slides and contents
+        # the number of frames of the last generate_slides_svg() run that
+        # reuse the files of an earlier frame with the same content
+        self.num_reused = 0
+
+        # a list containing the description of all the slides and contents.
+        # The visible layers of each frame are stored as a bitset over the
+        # layer ids of self.layers.
         self.content = None
+        self.layers = None
+
+        # the bitset of the layers listed in the #master# block
+        self.master_layers = None
 
         # temp folder to use
         self.tmp_folder = None
@@ -69,6 +88,23 @@ class InkSlides(object):
 
         self.flat = flat
 
+        # optional selectors to build only a subset of the frames. frames
+        # is a list of (first, last) ranges as returned by parse_ranges,
+        # sections a list of top level layer labels.
+        self.frames = frames
+        self.sections = sections
+
+        # if set, the selected frames are rendered to PNG files with this
+        # resolution instead of being merged to a PDF
+        self.draft_dpi = draft_dpi
+
+        # the cache of kept temp folders, see setup_temp_folder()
+        self.cache = Cache(limit=cache_limit)
+
+        # if set, the frames are streamed through the workers with at most
+        # this many frames generated but not yet merged, see run_streaming()
+        self.max_in_flight = max_in_flight
+
     def runwatch(self, file, temp=True):
 
         print("Started continuous mode! Cancel with Ctrl+C")
@@ -93,35 +129,43 @@ class InkSlides(object):
         """
 
         self.f_input = file
-        self.f_output = "{}.pdf".format(os.path.splitext(file)[0])
+        self.f_output = self.output_name()
+
+        if self.draft_dpi and os.path.exists(self.f_output) and not os.path.isdir(self.f_output):
+            raise IOError("Cannot write the draft to {}, it exists and is not a folder".format(self.f_output))
 
         self.setup_temp_folder(temp)
 
+        if self.max_in_flight:
+            self.run_streaming(temp)
+            return
+
         print("Parsing {} ...".format(self.f_input))
         self.parse()
 
         print("Creating SVG slides ...")
-        if self.create_slides_svg():
+        if self.create_slides_svg() and self.is_up_to_date():
+            self.update_cache(temp)
             print("PDF should be up to date. Quitting ...")
             return
 
-        print("Creating PDF slides in parallel on {} workers...".format(self.num_workers))
+        if not self.svg_files:
+            print("No frames match the selection. Quitting ...")
+            self.clear_temp_folder(temp)
+            return
+
+        print("Creating {} slides in parallel on {} workers...".format(
+            "PNG" if self.draft_dpi else "PDF", self.num_workers))
 
         # spawn a pool of workers and set up a request queue
         # see http://stackoverflow.com/a/9039979/169748
-        workers = []
         request_queue = Queue()
-        for i in range(self.num_workers):
-            workers.append(InkscapeWorker(request_queue))
-
-        # start workers
-        for w in workers:
-            w.start()
+        workers = self.start_workers(request_queue)
 
         # populate the queue
         self.pdf_files = []
-        for svg_file, cached in self.svg_files:
-            pdf_file = self.pdf_from_svg(svg_file)
+        for frame_num, svg_file, cached in self.svg_files:
+            pdf_file = self.output_from_svg(svg_file)
             self.pdf_files.append(pdf_file)
             request_queue.put((svg_file, pdf_file, cached))
 
@@ -133,14 +177,141 @@ class InkSlides(object):
         for w in workers:
             w.join()
 
-        print("Merging PDF slides ...")
-        self.join_slides_pdf()
+        if self.draft_dpi:
+            print("Copying PNG slides ...")
+            self.copy_slides_png()
+        else:
+            print("Merging PDF slides ...")
+            self.join_slides_pdf()
 
         # remove the temp folder, if the keep option was not set
         self.clear_temp_folder(temp)
+        self.update_cache(temp)
 
         print("Done creating {}.".format(self.f_output))
 
+    def run_streaming(self, temp):
+        """
+        Like run(), but the frames are generated lazily and handed to the
+        workers right away, and the finished pages are merged in order as
+        soon as they arrive. At most self.max_in_flight frames are generated
+        but not yet merged; generating the next frame waits until the
+        workers catch up. This keeps the memory use of generating and
+        rendering the frames flat for large decks. The merge and the list
+        of (frame_num, svg_file, cached) tuples kept for update_cache()
+        still grow with the number of frames.
+        """
+
+        # start the workers before parsing, so that the forked processes
+        # don't carry around a copy of the document
+        request_queue = Queue()
+        result_queue = Queue()
+        workers = self.start_workers(request_queue, result_queue)
+
+        # the workers are no daemons, so they have to be stopped if anything
+        # goes wrong. Otherwise python waits for them forever at exit.
+        abort = lambda: None
+        try:
+            print("Parsing {} ...".format(self.f_input))
+            self.parse()
+
+            if self.draft_dpi:
+                add_page = lambda frame_num, f: shutil.copy(f, self.draft_png_name(frame_num))
+                finish = lambda: None
+            else:
+                merger = MergerWrapper()
+                merger.begin(self.f_output)
+                add_page = lambda frame_num, f: merger.add(f)
+                finish = merger.finish
+                abort = merger.abort
+
+            print("Streaming {} slides through {} workers, at most {} frames in flight...".format(
+                "PNG" if self.draft_dpi else "PDF", self.num_workers, self.max_in_flight))
+
+            # the frame numbers and output files of the frames that are not
+            # merged yet, in order, and the files inkscape is still working on
+            pending = collections.deque()
+            rendering = set()
+
+            def merge_finished():
+                while pending and pending[0][1] not in rendering:
+                    add_page(*pending.popleft())
+
+            self.svg_files = []
+            for frame_num, svg_file, cached in self.generate_slides_svg():
+                out_file = self.output_from_svg(svg_file)
+                self.svg_files.append((frame_num, svg_file, cached))
+
+                # only touch the draft folder once a frame is selected
+                if self.draft_dpi and len(self.svg_files) == 1:
+                    self.setup_draft_folder()
+
+                if not cached:
+                    rendering.add(out_file)
+                    request_queue.put((svg_file, out_file, cached))
+
+                pending.append((frame_num, out_file))
+                merge_finished()
+
+                # backpressure: wait for the workers before generating more
+                while len(pending) >= self.max_in_flight:
+                    rendering.discard(self.wait_for_result(workers, result_queue))
+                    merge_finished()
+
+            # Sentinel objects to allow clean shutdown: 1 per worker.
+            for i in range(self.num_workers):
+                request_queue.put(None)
+
+            while rendering:
+                rendering.discard(self.wait_for_result(workers, result_queue))
+                merge_finished()
+
+            for w in workers:
+                w.join()
+
+        except BaseException:
+            for w in workers:
+                w.terminate()
+            for w in workers:
+                w.join()
+            abort()
+            raise
+
+        if not self.svg_files:
+            print("No frames match the selection. Quitting ...")
+            abort()
+        else:
+            finish()
+
+        # remove the temp folder, if the keep option was not set
+        self.clear_temp_folder(temp)
+        self.update_cache(temp)
+
+        if self.svg_files:
+            print("Done creating {}.".format(self.f_output))
+
+    def start_workers(self, request_queue, result_queue=None):
+        workers = []
+        for i in range(self.num_workers):
+            workers.append(InkscapeWorker(request_queue, dpi=self.draft_dpi, result_queue=result_queue))
+
+        # start workers
+        for w in workers:
+            w.start()
+
+        return workers
+
+    @staticmethod
+    def wait_for_result(workers, result_queue):
+        # wait for the next finished file, but don't hang forever if all
+        # the workers are gone
+        while True:
+            try:
+                return result_queue.get(timeout=1)
+            except Empty:
+                if not any(w.is_alive() for w in workers):
+                    raise RuntimeError("All inkscape workers exited unexpectedly")
+
     def setup_temp_folder(self, temp):
         # create (or detect) the temporary directory. If the keep option was
         # set, we use ./.inkslides as temp folder. if it exists, we reuse
@@ -149,6 +320,11 @@ class InkSlides(object):
         if not temp:
             base = os.path.splitext(os.path.basename(self.f_input))[0]
             self.tmp_folder = './.inkslides-%s' % base
+
+            # draft renders get their own folder, so that they never
+            # replace the cached files of a full PDF build.
+            if self.draft_dpi:
+                self.tmp_folder += '-draft%d' % self.draft_dpi
             if not os.path.exists(self.tmp_folder):
                 os.makedirs(self.tmp_folder)
         else:
@@ -158,6 +334,32 @@ class InkSlides(object):
         if temp:
             shutil.rmtree(self.tmp_folder)
 
+    def update_cache(self, temp):
+        """
+        Record the cache hits of this build and keep the kept temp folders
+        within the size limit. After a full build, files of frames that are
+        no longer part of the deck are removed right away.
+        """
+        if temp:
+            return
+
+        files = [f for frame_num, svg_file, cached in self.svg_files
+                 for f in (svg_file, self.output_from_svg(svg_file))]
+
+        # reused frames are marked as cached, but they never hit the cache
+        hits = sum(1 for frame_num, svg_file, cached in self.svg_files if cached) - self.num_reused
+        misses = len(self.svg_files) - self.num_reused - hits
+
+        if self.is_partial():
+            self.cache.record(self.tmp_folder, hits, misses)
+        else:
+            self.cache.prune(self.tmp_folder, files)
+            self.cache.record(self.tmp_folder, hits, misses, len(self.content))
+
+        freed = self.cache.gc(protect=files, current=self.tmp_folder)
+        if freed:
+            print("Evicted {} from the cache.".format(format_size(freed)))
+
     def parse(self):
         """
         Parse the input xml (svg) document and build up the 
@@ -166,6 +368,14 @@ class InkSlides(object):
         parser = XMLParser(ns_clean=True, huge_tree=True)
         self.doc = parse(self.f_input, parser=parser)
 
+        # inkscape declares the svg namespace twice, as default and with the
+        # svg: prefix. Drop the unused prefix, otherwise layers detached in
+        # write_slide_svg() come back as <svg:g>.
+        cleanup_namespaces(self.doc)
+
+        self.layers = LayerIndex()
+        self.master_layers = self.get_master_layers()
+
         # find the content descriptor, i.e., which slides to include when + how
         # self.content = self.get_content_description()
         self.content = self.get_layer_structure() if not self.flat else self.get_flat_layer_structure()
@@ -177,75 +387,137 @@ class InkSlides(object):
         """
         This function creates inkscape svg files for each slide
         specified in the self.content list. Those are later converted
-        to PDF by inkscape.
+        to PDF by inkscape. Returns True if all of them are cached.
         """
 
-        only_cached = True
-        self.svg_files = list()
+        self.svg_files = list(self.generate_slides_svg())
 
-        for frame_num, (slide_num, slide) in enumerate(self.content):
+        return all(cached for frame_num, svg_file, cached in self.svg_files)
+
+    def generate_slides_svg(self):
+        """
+        Generator version of create_slides_svg(). The svg files are
+        written one by one as (frame_num, svg_file, cached) tuples are
+        requested.
+        """
+
+        # instead of copying the document for every frame, we work on
+        # self.doc directly and only toggle the layers that differ from
+        # the previous frame. All layers are hidden after parse().
+        layers = get_all_layers(self.doc)
+        visible = 0
+
+        # bitset of the layers containing clones. Hidden layers may not
+        # be deleted if any of those is visible.
+        use_mask = 0
+        for label, layer in layers.items():
+            if layer.xpath('.//svg:use', namespaces=nsmap):
+                use_mask |= self.layers.bit(label)
+
+        num_elements = self.doc.xpath('//svg:text/svg:tspan[text()="#num#"]', namespaces=nsmap)
+        frame_num_elements = self.doc.xpath('//svg:text/svg:tspan[text()="#frame_num#"]', namespaces=nsmap)
+
+        # frames that result in the same svg file are rendered only once
+        rendered = {}
+        self.num_reused = 0
+
+        for frame_num, slide_num, slide in self.select_frames():
 
             svg_path = '{1}/slide-{0}.svg'.format(frame_num, self.tmp_folder)
 
-            # we copy the document instance and work on that copy
-            tmp_doc = copy.deepcopy(self.doc)
-            tmp_layers = get_all_layers(tmp_doc)
-
-            # set the slide layers to visible and apply opacity 1.0
-            do_delete = True
-            for layer in slide:
-                show_layer(tmp_layers[layer])
-                if tmp_layers[layer].xpath('.//svg:use', namespaces=nsmap):
-                    do_delete = False
-
-            if do_delete:
-                # add the hidden elements to the to-delete list
-                to_be_deleted = tmp_doc.xpath(
-                    '/*/svg:g[@inkscape:groupmode="layer"][contains(\
-                    @style, "display:none")]',
-                    namespaces=nsmap
-                )
-
-                # add the sodipodi:namedview element, which is just inkscape
-                # related stuff
-                to_be_deleted.append(
-                    tmp_doc.xpath('//sodipodi:namedview', namespaces=nsmap)[0])
-
-                # delete them
-                for layer in to_be_deleted:
-                    layer.getparent().remove(layer)
-
-            # calculate the sha256 hash of the current svg file, write svg
-            # to file
-            # and recalculate the hash
-            cached = os.path.exists(svg_path)
-            if cached:
-                old_hash = hashlib.sha256(open(svg_path, 'rb').read()).digest()
+            key = (slide,
+                   slide_num if num_elements else None,
+                   frame_num if frame_num_elements else None)
+            if key in rendered:
+                self.num_reused += 1
+                yield frame_num, rendered[key], True
+                continue
+
+            # set the slide layers to visible and hide the ones of the
+            # previous frame that are not part of this one
+            shown, hidden = diff(visible, slide)
+            for layer_id in iter_bits(shown):
+                show_layer(layers[self.layers.label(layer_id)])
+            for layer_id in iter_bits(hidden):
+                hide_layer(layers[self.layers.label(layer_id)])
+            visible = slide
 
             # replace text elements containing #num# with the slide number
-            for e in tmp_doc.xpath('//svg:text/svg:tspan[text()="#num#"]', namespaces=nsmap):
+            for e in num_elements:
                 e.text = str(slide_num)
 
-            # replace text elements containing #num# with the slide number
-            for e in tmp_doc.xpath('//svg:text/svg:tspan[text()="#frame_num#"]', namespaces=nsmap):
+            # replace text elements containing #frame_num# with the frame number
+            for e in frame_num_elements:
                 e.text = str(frame_num)
 
-            tmp_doc.write(svg_path)
+            # write the svg to a temporary file and compare its sha256
+            # hash to the one of the cached svg file
+            tmp_path = svg_path + '.tmp'
+            out_path = self.output_from_svg(svg_path)
+            self.write_slide_svg(tmp_path, delete_hidden=not slide & use_mask)
 
+            cached = os.path.exists(svg_path)
             if cached:
-                new_hash = hashlib.sha256(open(svg_path, 'rb').read()).digest()
+                old_hash = hashlib.sha256(open(svg_path, 'rb').read()).digest()
+                new_hash = hashlib.sha256(open(tmp_path, 'rb').read()).digest()
 
                 # if the hashes are equal AND the corresponding pdf file exists,
                 # we can use the cached version and don't have to go through
                 # inkscape again. yay!
-                cached = old_hash == new_hash and os.path.exists(self.pdf_from_svg(svg_path))
+                cached = old_hash == new_hash and os.path.exists(out_path)
+
+            if cached:
+                # mark the frame as recently used for the cache eviction.
+                # Only the access time is set, the modification time is
+                # compared to the one of the merged presentation.
+                os.remove(tmp_path)
+                touch_atime(svg_path)
+                touch_atime(out_path)
+            else:
+                # the pdf of the old svg is stale. Remove it before the
+                # new svg is moved in place, so that an interrupted build
+                # can't pair the two.
+                if os.path.exists(out_path):
+                    os.remove(out_path)
+                os.rename(tmp_path, svg_path)
 
-            self.svg_files.append((svg_path, cached))
+            rendered[key] = svg_path
+            yield frame_num, svg_path, cached
 
-            if not cached:
-                only_cached = False
+    def write_slide_svg(self, svg_path, delete_hidden=True):
+        """
+        Write self.doc to svg_path. If delete_hidden is set, the hidden top
+        level layers and the sodipodi:namedview element are left out of the
+        file. They are detached from the document only for writing and
+        put back afterwards.
+        """
 
-        return only_cached
+        removed = []
+
+        if delete_hidden:
+            # add the hidden elements to the to-delete list
+            to_be_deleted = self.doc.xpath(
+                '/*/svg:g[@inkscape:groupmode="layer"][contains(\
+                @style, "display:none")]',
+                namespaces=nsmap
+            )
+
+            # add the sodipodi:namedview element, which is just inkscape
+            # related stuff
+            to_be_deleted.append(
+                self.doc.xpath('//sodipodi:namedview', namespaces=nsmap)[0])
+
+            # delete them, remembering where they were
+            for layer in to_be_deleted:
+                parent = layer.getparent()
+                removed.append((parent, parent.index(layer), layer))
+                parent.remove(layer)
+
+        self.doc.write(svg_path)
+
+        # restore in reverse order, so that the indices are valid again
+        for parent, index, layer in reversed(removed):
+            parent.insert(index, layer)
 
     def create_slides_pdf(self):
         """
@@ -281,7 +553,7 @@ class InkSlides(object):
                     ink.kill()
                     break
 
-                svg_file, cached = self.svg_files.pop(0)
+                frame_num, svg_file, cached = self.svg_files.pop(0)
                 pdf_file = self.pdf_from_svg(svg_file)
 
                 # calculate percent of advance
@@ -312,6 +584,81 @@ class InkSlides(object):
                 if ink.stdout.read(1) == b'>':
                     ready = True
 
+    def select_frames(self):
+        """
+        Yield (frame_num, slide_num, slide) for every frame in self.content
+        matching the frames and sections selectors. Frame numbers are
+        the ones of the full presentation, so the cached files and the
+        #frame_num# replacement do not depend on the selection.
+        """
+        for frame_num, (slide_num, section, slide) in enumerate(self.content):
+            if self.frames and not in_ranges(frame_num + 1, self.frames):
+                continue
+
+            if self.sections and section not in self.sections:
+                continue
+
+            yield frame_num, slide_num, slide
+
+    def is_partial(self):
+        return bool(self.frames or self.sections or self.draft_dpi)
+
+    def is_up_to_date(self):
+        """
+        Check whether self.f_output is current, given that all frames are
+        cached. Partial builds render into the same cache folder, so the
+        merged presentation has to be newer than every frame PDF.
+        """
+        if self.is_partial() or not os.path.exists(self.f_output):
+            return False
+
+        mtime = os.path.getmtime(self.f_output)
+        return all(os.path.getmtime(self.output_from_svg(svg_file)) <= mtime
+                   for frame_num, svg_file, cached in self.svg_files)
+
+    def output_name(self):
+        """
+        The name of the generated presentation. Partial builds get their
+        own name so they don't overwrite the full presentation, and draft
+        builds write their PNG files to a folder.
+        """
+        base = os.path.splitext(self.f_input)[0]
+
+        if self.draft_dpi:
+            return "{}-draft".format(base)
+        elif self.is_partial():
+            return "{}-partial.pdf".format(base)
+        else:
+            return "{}.pdf".format(base)
+
+    def copy_slides_png(self):
+        """
+        Copy the rendered draft PNG files to the output folder.
+        """
+        self.setup_draft_folder()
+
+        # frames with the same content share a png file, so the files are
+        # named after the frames when copying
+        for (frame_num, svg_file, cached), png_file in zip(self.svg_files, self.pdf_files):
+            shutil.copy(png_file, self.draft_png_name(frame_num))
+
+    def draft_png_name(self, frame_num):
+        # counted from 1, like the --frames selector
+        return os.path.join(self.f_output, 'slide-%d.png' % (frame_num + 1))
+
+    def setup_draft_folder(self):
+        """
+        Create the draft folder, or remove the PNG files of the previous
+        draft from it. Other files in the folder are left alone.
+        """
+        if not os.path.exists(self.f_output):
+            os.makedirs(self.f_output)
+            return
+
+        for f in os.listdir(self.f_output):
+            if re.match(r'slide-\d+\.png$', f):
+                os.remove(os.path.join(self.f_output, f))
+
     def join_slides_pdf(self):
         """
         This function uses PyPDF2 to join the single PDF slides.
@@ -320,28 +667,39 @@ class InkSlides(object):
         merger = MergerWrapper()
         merger.merge(self.pdf_files, self.f_output)
 
-    def add_master_layers(self, current_layers):
-        # this function checks for a #master# text element anywhere and, if present, adds the
-        # following lines as layers to current_layers
+    def get_master_layers(self):
+        # this function checks for a #master# text element anywhere and, if present, returns
+        # the following lines as a bitset of layers
+        master_layers = 0
         cur_content_lines = self.doc.xpath('//svg:text/svg:tspan[starts-with(text(),"#master#")]/..', namespaces=nsmap)
 
         if cur_content_lines and len(cur_content_lines[0]) > 0:
             for l in cur_content_lines[0][1:]:
                 if l.text is not None:
-                    current_layers.append(l.text.strip())
+                    master_layers |= self.layers.bit(l.text.strip())
+
+        return master_layers
 
     def add_imported_layers(self, layer, current_layers):
         # this function checks for a #content# text element and, if present, adds the
-        # following lines as layers to current_layers
+        # following lines as layers to the bitset current_layers and returns the result
         cur_content_lines = layer.xpath('./svg:text/svg:tspan[starts-with(text(),"#import#")]/..', namespaces=nsmap)
 
         if cur_content_lines and len(cur_content_lines[0]) > 0:
             for l in cur_content_lines[0][1:]:
                 if l.text is not None:
                     if l.text[0] == "-":
-                        current_layers.remove(l.text[1:])
+                        # like removing from a list, removing a layer that
+                        # is not visible is an error. Typos don't pass silently.
+                        bit = self.layers.bit(l.text[1:].strip())
+                        if not current_layers & bit:
+                            raise ValueError("Cannot remove layer {}, it is not visible in layer {}".format(
+                                l.text[1:].strip(), get_label(layer)))
+                        current_layers &= ~bit
                     else:
-                        current_layers.append(l.text.strip())
+                        current_layers |= self.layers.bit(l.text.strip())
+
+        return current_layers
 
     def get_layer_structure(self):
         """
@@ -357,9 +715,9 @@ class InkSlides(object):
 
                 num_slide += 1
 
-                current_slide = [get_label(sec), get_label(slide)]
-                self.add_master_layers(current_slide)
-                self.add_imported_layers(slide, current_slide)
+                current_slide = self.layers.bit(get_label(sec)) | self.layers.bit(get_label(slide))
+                current_slide |= self.master_layers
+                current_slide = self.add_imported_layers(slide, current_slide)
 
                 sublayers = slide.xpath('./svg:g[@inkscape:groupmode="layer"]', namespaces=nsmap)
 
@@ -368,13 +726,13 @@ class InkSlides(object):
                     # We add them as frames to slide_tree
 
                     for sublayer in sublayers:
-                        current_slide.append(get_label(sublayer))
-                        self.add_imported_layers(sublayer, current_slide)
-                        slide_tree.append((num_slide, current_slide[:]))
+                        current_slide |= self.layers.bit(get_label(sublayer))
+                        current_slide = self.add_imported_layers(sublayer, current_slide)
+                        slide_tree.append((num_slide, get_label(sec), current_slide))
 
                 else:
                     # no sublayers present, we therefore add the current layer
-                    slide_tree.append((num_slide, current_slide[:]))
+                    slide_tree.append((num_slide, get_label(sec), current_slide))
 
         return slide_tree
 
@@ -388,16 +746,23 @@ class InkSlides(object):
         # iterate in reverse because svg is formated in this way
         for slide in self.doc.getroot().xpath('./svg:g[@inkscape:groupmode="layer"]', namespaces=nsmap):
             num_slide += 1
-            current_slide = [get_label(slide)]
-            self.add_master_layers(current_slide)
-            self.add_imported_layers(slide, current_slide)
-            slide_tree.append((num_slide, current_slide[:]))
+            current_slide = self.layers.bit(get_label(slide)) | self.master_layers
+            current_slide = self.add_imported_layers(slide, current_slide)
+            slide_tree.append((num_slide, get_label(slide), current_slide))
 
         return slide_tree
 
     def pdf_from_svg(self, svg_file_name):
         return ".".join(svg_file_name.split('.')[:-1]) + '.pdf'
 
+    def png_from_svg(self, svg_file_name):
+        return ".".join(svg_file_name.split('.')[:-1]) + '.png'
+
+    def output_from_svg(self, svg_file_name):
+        if self.draft_dpi:
+            return self.png_from_svg(svg_file_name)
+        return self.pdf_from_svg(svg_file_name)
+
 
 def main():
     # when the script is called directly...
@@ -412,12 +777,71 @@ def main():
                         help='Ignore sublayers and simply let each top level layer be one slide.')
     parser.add_argument('-p', '--parallel-workers', type=int, default=multiprocessing.cpu_count(),
                         help='The number of inkscape workers to spawn.')
+    parser.add_argument('-f', '--frames', type=parse_ranges, default=None,
+                        help='Only build the given frames, e.g. "1-3,7,10-". Frames are counted from 1.')
+    parser.add_argument('-s', '--section', action='append', dest='sections', default=None,
+                        help='Only build the frames of the given top level layer. May be repeated.')
+    parser.add_argument('-d', '--draft', action='store_true',
+                        help='Render the selected frames to low resolution PNG files for a quick preview.')
+    parser.add_argument('--draft-dpi', type=int, default=30,
+                        help='The resolution of the draft PNG files.')
+    parser.add_argument('--cache-limit', type=parse_size, default=DEFAULT_LIMIT,
+                        help='The maximum size of all kept temp folders together, e.g. "500M" (default: 1G).')
+    parser.add_argument('--stream', type=int, default=None, metavar='FRAMES',
+                        help='Stream the frames through the workers, generating them one by one. Bounds '
+                             'the number of frames generated but not yet merged to FRAMES.')
     parser.add_argument('file', metavar='svg-file', type=str, help='The svg file to process')
+
+    # `inkslides cache ...` manages the kept temp folders instead
+    if sys.argv[1:2] == ['cache']:
+        return cache_main(sys.argv[2:])
+
     args = parser.parse_args()
 
-    i = InkSlides(args.parallel_workers, flat=args.flat)
+    if args.stream is not None and args.stream < 1:
+        parser.error('--stream needs at least one frame in flight')
+
+    i = InkSlides(args.parallel_workers, flat=args.flat, frames=args.frames,
+                  sections=args.sections, draft_dpi=args.draft_dpi if args.draft else None,
+                  cache_limit=args.cache_limit, max_in_flight=args.stream)
 
     if args.watch:
         i.runwatch(file=args.file, temp=args.temp)
     else:
         i.run(file=args.file, temp=args.temp)
+
+
+def cache_main(argv):
+    # the cache subcommands
+
+    parser = argparse.ArgumentParser(prog='inkslides cache',
+                                     description='Manage the kept temp folders in the current directory.')
+    parser.add_argument('command', choices=('stat', 'gc', 'clear'),
+                        help='stat: show sizes and hit rates, gc: remove stale files and evict '
+                             'frames above the size limit, clear: remove all kept temp folders')
+    parser.add_argument('--cache-limit', type=parse_size, default=DEFAULT_LIMIT,
+                        help='The maximum size of all kept temp folders together, e.g. "500M" (default: 1G).')
+    args = parser.parse_args(argv)
+
+    cache = Cache(limit=args.cache_limit)
+
+    if args.command == 'stat':
+        for folder in cache.folders():
+            groups = cache.groups(folder)
+            stats = cache.read_stats(folder)
+            total = stats['hits'] + stats['misses']
+
+            print("{}: {} frames, {}, hit rate {}, {} reclaimable".format(
+                os.path.basename(folder), len(groups),
+                format_size(sum(size for stem, paths, size, last_used in groups)),
+                "{:.0%}".format(stats['hits'] / float(total)) if total else "n/a",
+                format_size(cache.reclaimable(folder))))
+
+        print("Total: {} of {}, {} reclaimable".format(
+            format_size(cache.size()), format_size(cache.limit), format_size(cache.reclaimable())))
+
+    elif args.command == 'gc':
+        print("Freed {}.".format(format_size(cache.gc())))
+
+    elif args.command == 'clear':
+        print("Freed {}.".format(format_size(cache.clear())))
@@ -0,0 +1,52 @@
+class LayerIndex(object):
+    """
+    Interns layer labels to integer ids, so that the set of visible layers
+    of a frame can be stored as a bitset in a plain python int. Bit i of
+    such a bitset is set if the layer with id i is visible.
+
+        >> index = LayerIndex()
+        >> frame = index.bit("Title") | index.bit("Welcome")
+        >> index.labels(frame)
+        ['Title', 'Welcome']
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, label):
+        """Returns the id of label, assigning a new one if necessary."""
+        try:
+            return self.ids[label]
+        except KeyError:
+            self.ids[label] = len(self.names)
+            self.names.append(label)
+            return self.ids[label]
+
+    def bit(self, label):
+        return 1 << self.intern(label)
+
+    def label(self, layer_id):
+        return self.names[layer_id]
+
+    def labels(self, bits):
+        return [self.names[i] for i in iter_bits(bits)]
+
+
+def iter_bits(bits):
+    """Yields the ids of all set bits, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def diff(old, new):
+    """
+    Returns a tuple (shown, hidden) of bitsets with the layers that
+    have to be made visible resp. hidden to get from frame old to new.
+    """
+    return new & ~old, old & ~new
@@ -1,5 +1,7 @@
 import os
+import shutil
 import subprocess
+import tempfile
 
 
 class MergeFailedException(Exception):
@@ -26,6 +28,26 @@ class Merger(object):
 
         raise NotImplementedError
 
+    def begin(self, out_file):
+        """
+        Starts an incremental merge. The slides are handed to add() one by
+        one, in order, and finish() writes the result to out_file. Mergers
+        that can't add single slides collect them and call merge() at the
+        end.
+        """
+        self.out_file = out_file
+        self.slides = []
+
+    def add(self, slide):
+        self.slides.append(slide)
+
+    def finish(self):
+        self.merge(self.slides, self.out_file)
+
+    def abort(self):
+        """Cancels an incremental merge without writing out_file."""
+        self.slides = []
+
 
 class PyPDFMerger(Merger):
     """
@@ -55,6 +77,93 @@ class PyPDFMerger(Merger):
         except:
             raise MergeFailedException("Could not merge using PyPDF2")
 
+    # the number of slides that are collected in one intermediate file
+    # during an incremental merge
+    CHUNK_SIZE = 64
+
+    def begin(self, out_file):
+        try:
+            import PyPDF2
+
+            self.out_file = out_file
+            self.output = PyPDF2.PdfFileWriter()
+            self.streams = list()
+            self.chunks = list()
+            self.tmp_dir = None
+
+        except:
+            raise MergeFailedException("Could not merge using PyPDF2")
+
+    def add(self, slide):
+        # the pages are read lazily, so the streams have to stay open
+        # until the output is written. To bound the number of open files,
+        # every CHUNK_SIZE slides are written to an intermediate file.
+        try:
+            import PyPDF2
+
+            stream = open(slide, "rb")
+            self.streams.append(stream)
+            pypdf_file = PyPDF2.PdfFileReader(stream)
+            self.output.addPage(pypdf_file.getPage(0))
+
+            if len(self.streams) >= self.CHUNK_SIZE:
+                self.flush()
+
+        except:
+            self.abort()
+            raise MergeFailedException("Could not merge using PyPDF2")
+
+    def flush(self):
+        import PyPDF2
+
+        if self.tmp_dir is None:
+            self.tmp_dir = tempfile.mkdtemp()
+
+        chunk = os.path.join(self.tmp_dir, "chunk-%d.pdf" % len(self.chunks))
+        with open(chunk, "wb") as out_stream:
+            self.output.write(out_stream)
+
+        for stream in self.streams:
+            stream.close()
+
+        self.chunks.append(chunk)
+        self.output = PyPDF2.PdfFileWriter()
+        self.streams = list()
+
+    def finish(self):
+        try:
+            import PyPDF2
+
+            if self.chunks:
+                if self.streams:
+                    self.flush()
+
+                # the intermediate files are joined page by page
+                for chunk in self.chunks:
+                    stream = open(chunk, "rb")
+                    self.streams.append(stream)
+                    pypdf_file = PyPDF2.PdfFileReader(stream)
+                    for page in range(pypdf_file.getNumPages()):
+                        self.output.addPage(pypdf_file.getPage(page))
+
+            with open(self.out_file, "wb") as out_stream:
+                self.output.write(out_stream)
+
+        except:
+            raise MergeFailedException("Could not merge using PyPDF2")
+
+        finally:
+            self.abort()
+
+    def abort(self):
+        for stream in self.streams:
+            stream.close()
+        self.streams = list()
+
+        if self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+
 
 class TexliveMerger(Merger):
     """
@@ -114,6 +223,18 @@ class MergerWrapper(object):
     def merge(self, slides, tmp_dir):
         self.merger.merge(slides, tmp_dir)
 
+    def begin(self, out_file):
+        self.merger.begin(out_file)
+
+    def add(self, slide):
+        self.merger.add(slide)
+
+    def finish(self):
+        self.merger.finish()
+
+    def abort(self):
+        self.merger.abort()
+
     def find_merging_tool(self):
         """Tests, which of the merger tools is available on the computer."""
 
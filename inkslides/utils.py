@@ -1,4 +1,6 @@
+import os
 import re
+import time
 
 nsmap = {
     'svg': 'http://www.w3.org/2000/svg',
@@ -84,3 +86,52 @@ def show_layer(layer):
     styles['display'] = 'inline'
     # styles['opacity'] = str(opacity)
     set_styles(layer, styles)
+
+
+def parse_ranges(spec):
+    """
+    Parse a frame selection like "1-3,7,10-" into a list of (first, last)
+    tuples. Frames are counted from 1, and an open upper bound is given
+    as None. Raises a ValueError for malformed selections.
+    """
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+
+        if '-' in part:
+            first, last = part.split('-', 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else None
+        else:
+            first = last = int(part)
+
+        if first < 1 or (last is not None and last < first):
+            raise ValueError("invalid frame range: %s" % part)
+
+        ranges.append((first, last))
+
+    if not ranges:
+        raise ValueError("empty frame selection")
+
+    return ranges
+
+
+def in_ranges(num, ranges):
+    """Check whether num is covered by any of the (first, last) ranges."""
+    return any(first <= num and (last is None or num <= last) for first, last in ranges)
+
+
+def hide_layer(layer):
+    """
+    Hide a layer by setting the style= "display:none" attribute.
+    """
+    styles = get_styles(layer)
+    styles['display'] = 'none'
+    set_styles(layer, styles)
+
+
+def touch_atime(path):
+    """Set the access time of path to now, keeping its modification time."""
+    os.utime(path, (time.time(), os.path.getmtime(path)))